@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 import argparse
+import functools
 import os
 import re
+import string
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from urllib.parse import urlparse
 
@@ -13,6 +16,14 @@ except Exception as import_error:  # pragma: no cover
     print("Missing dependency: qrcode. Install with `pip install -r requirements.txt`.", file=sys.stderr)
     raise
 
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # pragma: no cover
+    Image = ImageDraw = ImageFont = None
+
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUTS_DIR = os.path.join(REPO_ROOT, "Outputs")
 
 ERROR_CORRECTION_MAP = {
     "L": ERROR_CORRECT_L,
@@ -21,13 +32,22 @@ ERROR_CORRECTION_MAP = {
     "H": ERROR_CORRECT_H,
 }
 
+# Filename sanitizing: map every disallowed ASCII character to "_", then collapse runs
+_FILENAME_ALLOWED = set(string.ascii_letters + string.digits + "._-")
+_FILENAME_XLATE = str.maketrans({chr(i): "_" for i in range(128) if chr(i) not in _FILENAME_ALLOWED})
+_MULTI_UNDERSCORE_RE = re.compile(r"_+")
+
+# Logo extensions tried directly before falling back to a Logos/ scan, in preference order
+_LOGO_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
-        description="Generate a QR code PNG from a single URL and save into Outputs/",
+        description="Generate QR code PNGs from one or more URLs and save into Outputs/",
     )
-    parser.add_argument("url", nargs="?", help="The URL to encode into the QR code")
+    parser.add_argument("url", nargs="*", help="The URL(s) to encode into QR codes")
     parser.add_argument("--url", dest="url_flag", help="Alternative way to pass the URL")
+    parser.add_argument("--urls-file", help="Text file with one URL per line (batch mode; '#' starts a comment)")
     parser.add_argument("--size", type=int, default=600, help="Output PNG size in pixels (width=height)")
     parser.add_argument(
         "--ec",
@@ -64,8 +84,9 @@ def validate_url(url: str) -> str:
 
 
 def sanitize_filename_component(text: str) -> str:
-    text = re.sub(r"[^A-Za-z0-9._-]+", "_", text)
-    text = re.sub(r"_+", "_", text).strip("._-")
+    # Non-ASCII becomes "?" first so the translation table covers everything
+    text = text.encode("ascii", errors="replace").decode("ascii").translate(_FILENAME_XLATE)
+    text = _MULTI_UNDERSCORE_RE.sub("_", text).strip("._-")
     return text or "qr"
 
 
@@ -79,33 +100,73 @@ def derive_filename(url: str) -> str:
     return f"{stem}.png"
 
 
-def ensure_outputs_dir(repo_root: str) -> str:
-    outputs_dir = os.path.join(repo_root, "Outputs")
-    os.makedirs(outputs_dir, exist_ok=True)
-    return outputs_dir
+def ensure_outputs_dir() -> str:
+    os.makedirs(OUTPUTS_DIR, exist_ok=True)
+    return OUTPUTS_DIR
 
 
-def build_qr_image(url: str, error_correction_key: str, quiet_zone: int, target_size: int):
+def _create_exclusive(path: str) -> bool:
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
+
+
+def reserve_output_path(outputs_dir: str, filename: str) -> str:
+    # Atomically create the file so concurrent runs never pick the same name
+    output_path = os.path.join(outputs_dir, filename)
+    if _create_exclusive(output_path):
+        return output_path
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    stem, ext = os.path.splitext(filename)
+    output_path = os.path.join(outputs_dir, f"{stem}_{timestamp}{ext}")
+    counter = 2
+    # Several batch workers can land on the same second
+    while not _create_exclusive(output_path):
+        output_path = os.path.join(outputs_dir, f"{stem}_{timestamp}_{counter}{ext}")
+        counter += 1
+    return output_path
+
+
+@functools.lru_cache(maxsize=128)
+def build_qr_matrix(url: str, error_correction_key: str, quiet_zone: int) -> tuple[int, bytes]:
+    # Encode the URL once; returns (modules per side, one byte per module: black=0, white=255)
     error_correction = ERROR_CORRECTION_MAP[error_correction_key]
     qr = qrcode.QRCode(
         version=None,
         error_correction=error_correction,
-        box_size=10,
         border=quiet_zone,
     )
     qr.add_data(url)
     qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    # Resize to requested size (keeping square)
-    try:
-        from PIL import Image
+    # Module matrix with the quiet zone included
+    matrix = qr.get_matrix()
+    data = bytes(0 if cell else 255 for row in matrix for cell in row)
+    return len(matrix), data
+
+
+def rasterize_matrix(modules: int, data: bytes, target_size: int):
+    if Image is None:
+        raise RuntimeError("Missing dependency: Pillow. Install with `pip install qrcode[pil]`.")
+    # Upscale by the largest whole box size that fits; NEAREST by an integer factor replicates each module
+    box_size = max(1, target_size // modules)
+    # frombuffer wraps the bytes without copying them (the image holds the reference)
+    img = Image.frombuffer("L", (modules, modules), data, "raw", "L", 0, 1)
+    if box_size > 1:
+        img = img.resize((modules * box_size, modules * box_size), resample=Image.NEAREST)
+    # Pad out any remainder to the requested size (keeping square)
+    if img.size != (target_size, target_size):
         img = img.resize((target_size, target_size), resample=Image.NEAREST)
-    except Exception:
-        # Fallback if PIL not present (qrcode[pil] should install it)
-        img = img.resize((target_size, target_size))
     return img
 
 
+def build_qr_image(url: str, error_correction_key: str, quiet_zone: int, target_size: int):
+    modules, data = build_qr_matrix(url, error_correction_key, quiet_zone)
+    return rasterize_matrix(modules, data, target_size)
+
+
 def find_logo_path(repo_root: str, logo_name: str | None) -> str | None:
     if not logo_name:
         return None
@@ -113,8 +174,17 @@ def find_logo_path(repo_root: str, logo_name: str | None) -> str | None:
     if not os.path.isdir(logos_dir):
         return None
 
-    # Normalize input: accept with or without extension
-    desired_stem = os.path.splitext(logo_name)[0].lower()
+    # Fast path: stat the requested stem with each preferred extension, in preference order.
+    # Only for plain file names, so absolute or nested paths can't reach outside Logos/.
+    typed_stem = os.path.splitext(logo_name)[0]
+    if os.path.basename(logo_name) == logo_name and not (os.altsep and os.altsep in logo_name):
+        for ext in _LOGO_EXTENSIONS:
+            path = os.path.join(logos_dir, typed_stem + ext)
+            if os.path.isfile(path):
+                return path
+
+    # Fallback: one directory scan for case-insensitive or other-extension matches
+    desired_stem = typed_stem.lower()
     desired_filename = logo_name.lower()
     candidates = []
     try:
@@ -136,32 +206,55 @@ def find_logo_path(repo_root: str, logo_name: str | None) -> str | None:
     return candidates[0] if candidates else None
 
 
+@functools.lru_cache(maxsize=16)
+def _load_scaled_logo(logo_path: str, mtime_ns: int, new_w: int):
+    # mtime_ns is only part of the cache key, so an edited logo file is reloaded
+    logo = Image.open(logo_path).convert("RGBA")
+    aspect = logo.width / max(logo.height, 1)
+    new_h = int(new_w / max(aspect, 1e-6))
+    # Heavy downscales look the same on a QR center with a cheaper filter than Lanczos
+    ratio = logo.width / new_w
+    if ratio > 4:
+        resample = Image.BOX
+    elif ratio > 2:
+        resample = Image.BILINEAR
+    else:
+        resample = Image.LANCZOS
+    return logo.resize((new_w, new_h), resample=resample)
+
+
 def overlay_logo(base_img, logo_path: str):
+    if Image is None:
+        return base_img
     try:
-        from PIL import Image
-        logo = Image.open(logo_path).convert("RGBA")
-        base_img = base_img.convert("RGBA")
-
         # Scale logo to ~20% of QR width
         qr_w, qr_h = base_img.size
         max_logo_w = max(1, int(qr_w * 0.2))
-        aspect = logo.width / max(logo.height, 1)
-        new_w = max_logo_w
-        new_h = int(new_w / max(aspect, 1e-6))
-        logo = logo.resize((new_w, new_h), resample=Image.LANCZOS)
+        logo_path = os.path.abspath(logo_path)
+        logo = _load_scaled_logo(logo_path, os.stat(logo_path).st_mtime_ns, max_logo_w)
+        new_w, new_h = logo.size
 
         # Center paste
         pos = ((qr_w - new_w) // 2, (qr_h - new_h) // 2)
-        base_img.alpha_composite(logo, dest=pos)
+        # Checked on the scaled logo: resampling softens transparent edges into mid-range alpha,
+        # so in practice only fully opaque logos take the paste path
+        alpha = logo.getchannel("A")
+        if any(alpha.histogram()[1:255]):
+            # Partially transparent pixels: full alpha compositing
+            base_img = base_img.convert("RGBA")
+            base_img.alpha_composite(logo, dest=pos)
+        else:
+            # No mid-range alpha: a masked paste onto RGB gives the same result with one channel less
+            base_img = base_img.convert("RGB")
+            base_img.paste(logo, pos, mask=alpha)
         return base_img
     except Exception:
         return base_img
 
 
-def _pick_truetype_font(preferred_size: int):
-    try:
-        from PIL import ImageFont
-    except Exception:
+@functools.lru_cache(maxsize=1)
+def _resolve_font_path() -> str | None:
+    if ImageFont is None:
         return None
 
     # Common macOS and generic candidates
@@ -175,93 +268,169 @@ def _pick_truetype_font(preferred_size: int):
     ]
     for path in candidates:
         try:
+            # Probe-load so an unreadable or corrupt file falls through to the next candidate
             if os.path.exists(path):
-                return ImageFont.truetype(path, preferred_size)
+                ImageFont.truetype(path)
+                return path
             # Also allow PIL to resolve by name in its font path
             if os.path.sep not in path:
-                return ImageFont.truetype(path, preferred_size)
+                ImageFont.truetype(path)
+                return path
         except Exception:
             continue
     return None
 
 
+@functools.lru_cache(maxsize=32)
+def _pick_truetype_font(preferred_size: int):
+    if ImageFont is None:
+        return None
+    path = _resolve_font_path()
+    if path is None:
+        return None
+    try:
+        return ImageFont.truetype(path, preferred_size)
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def _default_font():
+    # Cached so the same font object (and its _measure_text entries) is reused
+    return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=256)
+def _measure_text(text: str, font, stroke_width: int) -> tuple[int, int, int, int]:
+    # Fonts hash by identity and the cache keeps them alive, so the font object itself is a safe key.
+    # textbbox only needs font metrics, so a 1x1 scratch image is enough.
+    draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    return draw.textbbox((0, 0), text, font=font, stroke_width=stroke_width)
+
+
 def add_caption(base_img, caption: str | None, caption_size: int | None = None):
     if not caption:
         return base_img
+    if Image is None:
+        return base_img
     try:
-        from PIL import Image, ImageDraw, ImageFont
-        base_img = base_img.convert("RGBA")
         w, h = base_img.size
         # Determine font size relative to image width if not provided
         font_px = caption_size if caption_size and caption_size > 0 else max(20, int(w * 0.08))
         font = _pick_truetype_font(font_px)
         if font is None:
             # Fallback to default bitmap font
-            font = ImageFont.load_default()
+            font = _default_font()
             # Best-effort scale calculation based on default bbox measured later
 
         # Pre-measure text to allocate exact space with padding
-        tmp_img = Image.new("RGBA", (w, h), (255, 255, 255, 0))
-        tmp_draw = ImageDraw.Draw(tmp_img)
         text = str(caption)
-        bbox = tmp_draw.textbbox((0, 0), text, font=font, stroke_width=2)
+        bbox = _measure_text(text, font, 2)
         text_w = bbox[2] - bbox[0]
         text_h = bbox[3] - bbox[1]
         padding_y = max(12, int((font_px if caption_size else w * 0.02)))
         extra_h = max(text_h + padding_y * 2, 40)
 
-        canvas = Image.new("RGBA", (w, h + extra_h), (255, 255, 255, 255))
+        # Compose straight onto the final RGB canvas; paste converts the QR to RGB on the way in
+        canvas = Image.new("RGB", (w, h + extra_h), (255, 255, 255))
         canvas.paste(base_img, (0, 0))
 
         draw = ImageDraw.Draw(canvas)
         x = max(0, (w - text_w) // 2)
         y = h + max(0, (extra_h - text_h) // 2)
         # Draw with a subtle stroke for readability
-        draw.text((x, y), text, fill=(0, 0, 0, 255), font=font, stroke_width=2, stroke_fill=(255, 255, 255, 255))
-        return canvas.convert("RGB")
+        draw.text((x, y), text, fill=(0, 0, 0), font=font, stroke_width=2, stroke_fill=(255, 255, 255))
+        return canvas
     except Exception:
         return base_img
 
 
-def main() -> int:
-    args = parse_args()
-    url = args.url_flag or args.url
+def read_urls_file(path: str) -> list[str]:
+    urls = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            # Skip blank lines and comments
+            if line and not line.startswith("#"):
+                urls.append(line)
+    return urls
 
+
+def _generate_one(url: str, args: argparse.Namespace) -> tuple[int, str]:
+    # Generate one QR code; returns (exit code, output path or error message)
     try:
         url = validate_url(url)
     except ValueError as e:
-        print(str(e), file=sys.stderr)
-        return 2
-
-    repo_root = os.path.dirname(os.path.abspath(__file__))
-    outputs_dir = ensure_outputs_dir(repo_root)
+        return 2, str(e)
 
     filename = derive_filename(url)
-    output_path = os.path.join(outputs_dir, filename)
-
-    if os.path.exists(output_path) and not args.force:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        stem, ext = os.path.splitext(filename)
-        output_path = os.path.join(outputs_dir, f"{stem}_{timestamp}{ext}")
-
+    reserved_path = None
+    saved = False
     try:
+        outputs_dir = ensure_outputs_dir()
+        if args.force:
+            output_path = os.path.join(outputs_dir, filename)
+        else:
+            output_path = reserved_path = reserve_output_path(outputs_dir, filename)
+
         img = build_qr_image(url, args.ec, args.quiet_zone, args.size)
 
         # Optional logo overlay from Logos/
-        logo_path = find_logo_path(repo_root, args.logo_name)
+        logo_path = find_logo_path(REPO_ROOT, args.logo_name)
         if logo_path:
             img = overlay_logo(img, logo_path)
 
         # Optional caption text (auto-sizing with optional override)
-        img = add_caption(img, args.caption, args.caption_size)
-
-        img.save(output_path)
+        if args.caption:
+            img = add_caption(img, args.caption, args.caption_size)
+
+        if img.mode == "L":
+            # Plain QR is pure black/white: save as 1-bit PNG
+            img.convert("1", dither=Image.NONE).save(output_path)
+        else:
+            # Logo/caption output: skip libpng's slow filter search
+            img.save(output_path, optimize=False, compress_level=1)
+        saved = True
     except Exception as e:  # pragma: no cover
-        print(f"Failed to generate QR code: {e}", file=sys.stderr)
-        return 1
+        return 1, f"Failed to generate QR code: {e}"
+    finally:
+        if reserved_path and not saved:
+            # Drop the empty placeholder from reserve_output_path (also on Ctrl-C)
+            try:
+                os.remove(reserved_path)
+            except OSError:
+                pass
+
+    return 0, output_path
+
 
-    print(output_path)
-    return 0
+def main() -> int:
+    args = parse_args()
+    urls = ([args.url_flag] if args.url_flag else []) + list(args.url)
+    if args.urls_file:
+        try:
+            urls += read_urls_file(args.urls_file)
+        except OSError as e:
+            print(f"Cannot read URLs file: {e}", file=sys.stderr)
+            return 2
+    if not urls:
+        urls = [None]
+
+    if len(urls) == 1:
+        results = [_generate_one(urls[0], args)]
+    else:
+        # Batch mode: each worker pays the import/font cache cost once and reuses it
+        with ProcessPoolExecutor() as executor:
+            results = list(executor.map(functools.partial(_generate_one, args=args), urls))
+
+    status = 0
+    for code, message in results:
+        if code:
+            print(message, file=sys.stderr)
+            status = status or code
+        else:
+            print(message)
+    return status
 
 
 if __name__ == "__main__":